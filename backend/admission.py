@@ -0,0 +1,169 @@
+"""
+Admission control for AI-heavy endpoints.
+Bounds how many AI decisions run at once per process, queues a limited number of
+callers for a limited time, and rate limits per session and per client, so that a
+burst of AI work is rejected quickly instead of tying up every worker.
+"""
+import contextlib
+import math
+import threading
+import time
+from typing import Optional
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is not admitted. Carries the HTTP status and a Retry-After hint in seconds."""
+
+    def __init__(self, status_code: int, retry_after: int, reason: str):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class TokenBucketLimiter:
+    """
+    Per-key token bucket: each key may make `rate` calls per second on average,
+    with bursts of up to `burst` calls.
+    """
+
+    # Buckets untouched for this long are full again and can be forgotten.
+    PRUNE_AFTER_SECONDS = 300
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+        self._last_prune = time.monotonic()
+
+    def check(self, key: str):
+        """Take one token for key, or raise AdmissionRejected(429) if the bucket is empty."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                retry_after = math.ceil((1 - tokens) / self.rate)
+                raise AdmissionRejected(429, retry_after, "Too many requests, slow down")
+            self._buckets[key] = (tokens - 1, now)
+            if now - self._last_prune > self.PRUNE_AFTER_SECONDS:
+                self._prune(now)
+
+    def _prune(self, now: float):
+        self._last_prune = now
+        self._buckets = {
+            key: bucket for key, bucket in self._buckets.items()
+            if now - bucket[1] < self.PRUNE_AFTER_SECONDS
+        }
+
+
+class ConcurrencyLimiter:
+    """
+    Allows at most max_concurrent holders at a time. Up to max_queue further callers
+    wait for at most max_wait_seconds; anyone beyond that is rejected with 503 right away.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, max_wait_seconds: float):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self._cond = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.max_waiting_seen = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.total_wait_seconds = 0.0
+        # Moving average of how long a slot is held, used for Retry-After estimates.
+        self.avg_hold_seconds = 1.0
+
+    def _retry_after(self) -> int:
+        backlog = self.waiting + 1
+        return max(1, math.ceil(self.avg_hold_seconds * backlog / self.max_concurrent))
+
+    @contextlib.contextmanager
+    def slot(self):
+        """Hold one slot for the duration of the with-block."""
+        start = time.monotonic()
+        with self._cond:
+            if self.active >= self.max_concurrent:
+                if self.waiting >= self.max_queue:
+                    self.rejected_queue_full += 1
+                    raise AdmissionRejected(503, self._retry_after(), "Server is busy, try again later")
+                self.waiting += 1
+                self.max_waiting_seen = max(self.max_waiting_seen, self.waiting)
+                try:
+                    admitted = self._cond.wait_for(
+                        lambda: self.active < self.max_concurrent, timeout=self.max_wait_seconds
+                    )
+                finally:
+                    self.waiting -= 1
+                if not admitted:
+                    self.rejected_timeout += 1
+                    raise AdmissionRejected(503, self._retry_after(), "Server is busy, try again later")
+            self.active += 1
+            self.admitted += 1
+            self.total_wait_seconds += time.monotonic() - start
+        acquired = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.active -= 1
+                self.avg_hold_seconds = 0.9 * self.avg_hold_seconds + 0.1 * (time.monotonic() - acquired)
+                self._cond.notify()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "active": self.active,
+                "queue_depth": self.waiting,
+                "max_queue_depth_seen": self.max_waiting_seen,
+                "admitted": self.admitted,
+                "rejected_queue_full": self.rejected_queue_full,
+                "rejected_timeout": self.rejected_timeout,
+                "avg_wait_seconds": self.total_wait_seconds / self.admitted if self.admitted else 0.0,
+                "avg_hold_seconds": self.avg_hold_seconds
+            }
+
+
+class AdmissionController:
+    """Combines per-session and per-client rate limits with the AI concurrency limit."""
+
+    def __init__(self, concurrency: ConcurrencyLimiter, session_limiter: TokenBucketLimiter,
+                 client_limiter: TokenBucketLimiter):
+        self.concurrency = concurrency
+        self.session_limiter = session_limiter
+        self.client_limiter = client_limiter
+        self._lock = threading.Lock()
+        self.rejected_rate_limited = 0
+
+    def check_rate(self, session_id: Optional[str], client_id: Optional[str]):
+        """Apply the rate limits that are relevant for this caller."""
+        try:
+            if client_id is not None:
+                self.client_limiter.check(client_id)
+            if session_id is not None:
+                self.session_limiter.check(session_id)
+        except AdmissionRejected:
+            with self._lock:
+                self.rejected_rate_limited += 1
+            raise
+
+    @contextlib.contextmanager
+    def ai_call(self, session_id: Optional[str] = None, client_id: Optional[str] = None):
+        """Rate limit the caller, then hold an AI slot for the duration of the with-block."""
+        self.check_rate(session_id, client_id)
+        with self.concurrency.slot():
+            yield
+
+    def stats(self) -> dict:
+        stats = self.concurrency.stats()
+        with self._lock:
+            stats["rejected_rate_limited"] = self.rejected_rate_limited
+        return stats
@@ -0,0 +1,311 @@
+"""
+Microbenchmarks for AI player decisions, independent of HTTP and Redis.
+
+Record a corpus of positions from simulated games (or from live sessions), then replay it
+through each player's select_move and flip_hand:
+
+    python bench_players.py record --games 20 --out positions.jsonl
+    python bench_players.py record --from-sessions --out live_positions.jsonl
+    python bench_players.py run positions.jsonl --players PlanningPlayer NeuralPlayer
+    python bench_players.py run positions.jsonl --players PlanningPlayer --planning-workers 2 4
+
+The corpus is a JSON lines file. The first line is a header carrying the format version;
+every other line is one position with its metadata and the pickled engine object.
+"""
+import argparse
+import base64
+import json
+import logging
+import os
+import pickle
+import statistics
+import time
+import tracemalloc
+from collections import defaultdict
+from importlib import metadata
+from typing import Callable, Iterable, Iterator, Optional
+
+from player_registry import SUPPORTED_PLAYERS
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+CORPUS_FORMAT = "scout-position-corpus"
+CORPUS_VERSION = 1
+
+# Safety limit against games that never end.
+MAX_MOVES_PER_ROUND = 500
+
+GROUP_BY = ["hand_size", "table_length", "num_players"]
+
+
+def make_position(kind: str, state, num_players: int, hand_size: int, table_length: int) -> dict:
+    """
+    Build a corpus entry. kind is "move" (state is an info_state for select_move)
+    or "flip" (state is a hand for flip_hand).
+    """
+    return {
+        "kind": kind,
+        "num_players": num_players,
+        "hand_size": hand_size,
+        "table_length": table_length,
+        "state": base64.b64encode(pickle.dumps(state)).decode("ascii")
+    }
+
+
+def load_state(position: dict):
+    """Unpickle a fresh copy of the position's engine object."""
+    return pickle.loads(base64.b64decode(position["state"]))
+
+
+def engine_version() -> Optional[str]:
+    try:
+        return metadata.version("scout-engine")
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def write_corpus(path: str, positions: Iterable[dict], source: str) -> int:
+    """Write positions to path, preceded by a versioned header. Returns the number written."""
+    count = 0
+    with open(path, "w") as f:
+        header = {
+            "format": CORPUS_FORMAT,
+            "version": CORPUS_VERSION,
+            "engine_version": engine_version(),
+            "source": source,
+            "created_at": time.time()
+        }
+        f.write(json.dumps(header) + "\n")
+        for position in positions:
+            f.write(json.dumps(position) + "\n")
+            count += 1
+    return count
+
+
+def read_corpus(path: str) -> tuple[dict, list[dict]]:
+    """Read a corpus file, returning its header and positions."""
+    with open(path) as f:
+        header = json.loads(f.readline())
+        if header.get("format") != CORPUS_FORMAT:
+            raise ValueError(f"{path} is not a position corpus")
+        if header.get("version") != CORPUS_VERSION:
+            raise ValueError(f"Unsupported corpus version {header.get('version')}, expected {CORPUS_VERSION}")
+        positions = [json.loads(line) for line in f if line.strip()]
+    if header.get("engine_version") != engine_version():
+        logging.warning(
+            f"Corpus was recorded with scout-engine {header.get('engine_version')}, "
+            f"running {engine_version()}; pickled positions may not load"
+        )
+    return header, positions
+
+
+def move_position(game_state) -> dict:
+    info_state = game_state.info_state()
+    return make_position(
+        "move", info_state, game_state.num_players,
+        len(game_state.hands[game_state.current_player]), len(game_state.table)
+    )
+
+
+def simulate_positions(num_games: int, player_counts: list[int], player_name: str) -> Iterator[dict]:
+    """Play full games between copies of one AI player and yield every decision point."""
+    from scout_engine.game_state import MultiRoundGameState
+
+    factory = SUPPORTED_PLAYERS[player_name]
+    for game in range(num_games):
+        num_players = player_counts[game % len(player_counts)]
+        multi_round_state = MultiRoundGameState(num_players)
+        players = [factory() for _ in range(num_players)]
+        while True:
+            game_state = multi_round_state.game_state
+            flip_positions = []
+
+            def flip_fn(player):
+                def flip(hand):
+                    flip_positions.append(make_position("flip", hand, num_players, len(hand), 0))
+                    return player.flip_hand(hand)
+                return flip
+
+            game_state.maybe_flip_hand([flip_fn(player) for player in players])
+            yield from flip_positions
+            for _ in range(MAX_MOVES_PER_ROUND):
+                if game_state.is_finished():
+                    break
+                position = move_position(game_state)
+                yield position
+                game_state.move(players[game_state.current_player].select_move(load_state(position)))
+            if not multi_round_state.next_round():
+                break
+        logging.info(f"Simulated game {game + 1}/{num_games} with {num_players} players")
+
+
+def session_positions() -> Iterator[dict]:
+    """
+    Yield the current decision point of every live session that is in the middle of a round.
+    Connects to the same Redis shards as the server, but only reads from them.
+    """
+    from session_store import ShardedSessionStore, parse_redis_urls
+
+    redis_urls = parse_redis_urls(os.environ.get(
+        "REDIS_URLS", os.environ.get("KV_URL", os.environ.get("REDIS_URL", "redis://localhost:6379"))
+    ))
+    # Read-only: no migration between shards, none of the server's cleanup or demotion threads, and an
+    # unreachable Redis is an error rather than an empty fakeredis.
+    store = ShardedSessionStore.from_urls(redis_urls, fallback_to_fakeredis=False, migrate_on_miss=False)
+    for client, key in store.scan_keys():
+        data = client.get(key)
+        if not data:
+            continue
+        try:
+            game_state = pickle.loads(data)["multi_round_state"].game_state
+        except Exception as e:
+            logging.warning(f"Skipping unreadable session {key}: {e}")
+            continue
+        if game_state.initial_flip_executed and not game_state.is_finished():
+            yield move_position(game_state)
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: list[float]) -> dict:
+    """Latency distribution in milliseconds."""
+    values = sorted(seconds * 1000 for seconds in latencies)
+    return {
+        "n": len(values),
+        "mean_ms": statistics.fmean(values),
+        "p50_ms": percentile(values, 0.5),
+        "p90_ms": percentile(values, 0.9),
+        "p99_ms": percentile(values, 0.99),
+        "max_ms": values[-1]
+    }
+
+
+def group_latencies(samples: list[tuple[dict, float]], field: str) -> dict:
+    """Summarize (position, latency) samples per distinct value of a position field."""
+    groups = defaultdict(list)
+    for position, seconds in samples:
+        groups[position[field]].append(seconds)
+    return {value: summarize(groups[value]) for value in sorted(groups)}
+
+
+def decide(player, position: dict, state):
+    if position["kind"] == "flip":
+        return player.flip_hand(state)
+    return player.select_move(state)
+
+
+def parallel_planning_factory(workers: int) -> Callable:
+    """Factory for a PlanningPlayer split over workers processes, regardless of PLANNING_PARALLEL_WORKERS."""
+    def factory():
+        from parallel_planning import ParallelPlanningPlayer
+        from scout_engine.players import PlanningPlayer
+        return ParallelPlanningPlayer(PlanningPlayer(), workers, seed=0)
+    return factory
+
+
+def benchmark_player(factory: Callable, positions: list[dict], repeat: int) -> dict:
+    """Replay positions through a player made by factory, returning latency distributions and peak memory."""
+    player = factory()
+    # Warm up lazy imports and caches so they do not show up as the first sample.
+    decide(player, positions[0], load_state(positions[0]))
+
+    samples = defaultdict(list)
+    for _ in range(repeat):
+        for position in positions:
+            state = load_state(position)
+            start = time.perf_counter()
+            decide(player, position, state)
+            samples[position["kind"]].append((position, time.perf_counter() - start))
+
+    # Separate pass, since tracing allocations slows every call down.
+    tracemalloc.start()
+    try:
+        for position in positions:
+            decide(player, position, load_state(position))
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    result = {"peak_memory_mb": peak_bytes / 2**20}
+    for kind, kind_samples in samples.items():
+        result[kind] = {"overall": summarize([seconds for _, seconds in kind_samples])}
+        for field in GROUP_BY:
+            result[kind][f"by_{field}"] = group_latencies(kind_samples, field)
+    return result
+
+
+def format_table(title: str, rows: dict) -> str:
+    lines = [title, f"{'':>8} {'n':>6} {'mean':>9} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}"]
+    for key, row in rows.items():
+        lines.append(
+            f"{key!s:>8} {row['n']:>6} {row['mean_ms']:>9.2f} {row['p50_ms']:>9.2f} "
+            f"{row['p90_ms']:>9.2f} {row['p99_ms']:>9.2f} {row['max_ms']:>9.2f}"
+        )
+    return "\n".join(lines)
+
+
+def format_report(results: dict) -> str:
+    sections = []
+    for player_name, result in results.items():
+        sections.append(f"=== {player_name} (peak traced memory {result['peak_memory_mb']:.1f} MB, times in ms) ===")
+        for kind in ("flip", "move"):
+            if kind not in result:
+                continue
+            method = "flip_hand" if kind == "flip" else "select_move"
+            sections.append(format_table(f"{method} overall", {"all": result[kind]["overall"]}))
+            for field in GROUP_BY:
+                sections.append(format_table(f"{method} by {field}", result[kind][f"by_{field}"]))
+    return "\n\n".join(sections)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record = subparsers.add_parser("record", help="Record a position corpus")
+    record.add_argument("--out", default="positions.jsonl")
+    record.add_argument("--games", type=int, default=10, help="Number of simulated games")
+    record.add_argument("--num-players", type=int, nargs="+", default=[3, 4, 5],
+                        help="Player counts to cycle through in simulated games")
+    record.add_argument("--player", default="PlanningPlayer", choices=list(SUPPORTED_PLAYERS),
+                        help="AI player that plays the simulated games")
+    record.add_argument("--from-sessions", action="store_true",
+                        help="Record the current positions of live sessions instead of simulating games")
+
+    run = subparsers.add_parser("run", help="Replay a position corpus through AI players")
+    run.add_argument("corpus")
+    run.add_argument("--players", nargs="+", default=list(SUPPORTED_PLAYERS), choices=list(SUPPORTED_PLAYERS))
+    run.add_argument("--repeat", type=int, default=1, help="How often to replay the corpus per player")
+    run.add_argument("--planning-workers", type=int, nargs="+", default=[],
+                     help="Also benchmark PlanningPlayer split over this many processes")
+    run.add_argument("--json", help="Also write the raw results to this file")
+
+    args = parser.parse_args()
+    if args.command == "record":
+        if args.from_sessions:
+            count = write_corpus(args.out, session_positions(), "sessions")
+        else:
+            source = f"simulated:{args.player}"
+            count = write_corpus(args.out, simulate_positions(args.games, args.num_players, args.player), source)
+        logging.info(f"Wrote {count} positions to {args.out}")
+    else:
+        header, positions = read_corpus(args.corpus)
+        if not positions:
+            parser.error(f"{args.corpus} contains no positions")
+        logging.info(f"Loaded {len(positions)} positions recorded from {header['source']}")
+        factories = {name: SUPPORTED_PLAYERS[name] for name in args.players}
+        for workers in args.planning_workers:
+            factories[f"PlanningPlayer x{workers} workers"] = parallel_planning_factory(workers)
+        results = {name: benchmark_player(factory, positions, args.repeat) for name, factory in factories.items()}
+        print(format_report(results))
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,285 @@
+"""
+Parallel move selection for PlanningPlayer.
+
+A decision is split by candidate move: every worker plans with the same player, but only
+sees a share of the root moves, and picks the best one among them. A final pass then picks
+among the workers' choices. Each planning step costs roughly in proportion to the number of
+root moves, so splitting them lowers the wall clock time of slow decisions on multi-core hosts.
+
+Split decisions run in a process pool shared by the whole server. Every task seeds its random
+number generators from the player's seed, so a given seed always yields the same moves.
+A task that runs for longer than PLANNING_TASK_TIMEOUT_SECONDS is considered hung: its decision
+is planned in-process instead, and the pool is replaced, since a running task cannot be stopped.
+
+Only planners that keep no state between decisions are supported: workers plan on copies of
+the player, and those copies are discarded.
+"""
+import contextlib
+import hashlib
+import logging
+import multiprocessing
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, CancelledError, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+# Below this many root moves per worker, splitting costs more than it saves.
+MIN_MOVES_PER_WORKER = 4
+
+# Upper bound on a single pool task, counted from when a worker starts it, so a hung worker cannot
+# hold an AI admission slot forever. Time spent queued behind other decisions does not count.
+TASK_TIMEOUT_SECONDS = float(os.environ.get("PLANNING_TASK_TIMEOUT_SECONDS", 30))
+
+# How often a waiting decision checks which of its tasks have started.
+POLL_SECONDS = 0.05
+
+_pool: Optional[ProcessPoolExecutor] = None
+# Workers put the token of every task they start on this queue; it belongs to _pool.
+_started_queue = None
+_pool_lock = threading.Lock()
+
+# Start times of the tasks decisions are waiting for, by token; None until a worker reports the start.
+_task_starts: dict[str, Optional[float]] = {}
+_task_starts_lock = threading.Lock()
+
+# Set in pool workers by _init_worker.
+_worker_started_queue = None
+
+
+def _init_worker(started_queue):
+    global _worker_started_queue
+    _worker_started_queue = started_queue
+
+
+def _get_pool():
+    """Return the process pool shared by all decisions and its queue of started tasks, starting it on first use."""
+    global _pool, _started_queue
+    with _pool_lock:
+        if _pool is None:
+            size = int(os.environ.get("PLANNING_POOL_SIZE", os.cpu_count() or 1))
+            # Forking a multi-threaded server process is unsafe, so workers are spawned.
+            context = multiprocessing.get_context("spawn")
+            # A worker terminated while writing may leave a queue unusable, so every pool gets its own.
+            _started_queue = context.Queue()
+            _pool = ProcessPoolExecutor(
+                max_workers=size, mp_context=context, initializer=_init_worker, initargs=(_started_queue,)
+            )
+            logging.info(f"Started planning process pool with {size} workers")
+        return _pool, _started_queue
+
+
+def _reset_pool(pool: ProcessPoolExecutor):
+    """
+    Throw away pool, terminating its workers in case one of them hangs.
+    Does nothing if another thread already replaced it.
+    """
+    global _pool, _started_queue
+    with _pool_lock:
+        if pool is None or _pool is not pool:
+            return
+        # The executor has no public way to stop a running task.
+        for process in list(getattr(pool, "_processes", {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+        _started_queue = None
+
+
+class _TaskHung(Exception):
+    pass
+
+
+def _wait_for_tasks(futures: dict[str, Future], started_queue):
+    """
+    Wait until all futures, keyed by task token, are done. Raises _TaskHung as soon as one
+    of them has been running in a worker for longer than TASK_TIMEOUT_SECONDS.
+    """
+    pending = set(futures.values())
+    while pending:
+        _, pending = wait(pending, timeout=POLL_SECONDS, return_when=FIRST_COMPLETED)
+        now = time.monotonic()
+        with _task_starts_lock:
+            # Starts are timed when they are read, which is never earlier than the task started.
+            while True:
+                try:
+                    token = started_queue.get_nowait()
+                except (queue.Empty, OSError, ValueError):
+                    break
+                if token in _task_starts and _task_starts[token] is None:
+                    _task_starts[token] = now
+            for token, future in futures.items():
+                start = _task_starts.get(token)
+                if future in pending and start is not None and now - start > TASK_TIMEOUT_SECONDS:
+                    raise _TaskHung(f"Planning task has been running for over {TASK_TIMEOUT_SECONDS}s")
+
+
+class RestrictedInfoState:
+    """
+    Wraps an info_state so that only the allowed moves are offered at the root.
+    Everything else, including states derived from it while planning, is the real thing.
+    """
+
+    def __init__(self, info_state, allowed: list):
+        self._info_state = info_state
+        self._allowed = allowed
+        # Calls where none of the moves matched the allowed ones, so all moves were offered.
+        self.fallbacks = 0
+
+    def possible_moves(self, *args, **kwargs):
+        moves = self._info_state.possible_moves(*args, **kwargs)
+        restricted = [move for move in moves if move in self._allowed]
+        if restricted:
+            return restricted
+        # Another representation of the moves (e.g. coalesce=False) may not match the allowed ones.
+        self.fallbacks += 1
+        logging.warning(f"possible_moves{args or ''}{kwargs or ''} matched none of the allowed moves")
+        return moves
+
+    def __getattr__(self, name):
+        # Guard against recursion while unpickling, before _info_state is set.
+        if name.startswith("__") or name == "_info_state":
+            raise AttributeError(name)
+        return getattr(self._info_state, name)
+
+
+def _seed_rngs(seed: int):
+    random.seed(seed)
+    try:
+        import numpy
+        numpy.random.seed(seed)
+    except ImportError:
+        pass
+
+
+@contextlib.contextmanager
+def _seeded_rngs(seed: int):
+    """Seed the global random number generators for the duration of the block, then restore their state."""
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+    random_state = random.getstate()
+    numpy_state = numpy.random.get_state() if numpy else None
+    _seed_rngs(seed)
+    try:
+        yield
+    finally:
+        random.setstate(random_state)
+        if numpy:
+            numpy.random.set_state(numpy_state)
+
+
+def _select_move_task(player, info_state, allowed: list, seed: int, token: str):
+    """
+    Runs in a pool worker: plan over the allowed root moves.
+    Returns the move and whether the restriction held, i.e. the planner only saw allowed moves.
+    """
+    _worker_started_queue.put(token)
+    _seed_rngs(seed)
+    restricted = RestrictedInfoState(info_state, allowed)
+    move = player.select_move(restricted)
+    return move, restricted.fallbacks == 0 and move in allowed
+
+
+class ParallelPlanningPlayer:
+    """
+    Wraps a PlanningPlayer and spreads each move decision over `workers` processes.
+    Hand flips and decisions with few moves are cheap and run in-process.
+    """
+
+    def __init__(self, player, workers: int, seed: Optional[int] = None):
+        self.player = player
+        self.workers = workers
+        self.seed = seed
+        self.decisions = 0
+
+    @property
+    def display_name(self) -> str:
+        """Name shown to players; the wrapper plays like the player it wraps."""
+        return self.player.__class__.__name__
+
+    def _task_seed(self, decision: int, task: int) -> int:
+        if self.seed is None:
+            return random.randrange(2**32)
+        digest = hashlib.sha256(f"{self.seed}:{decision}:{task}".encode()).digest()
+        return int.from_bytes(digest[:4], "big")
+
+    def flip_hand(self, hand) -> bool:
+        return self.player.flip_hand(hand)
+
+    def _select_move_in_process(self, info_state, decision: int):
+        if self.seed is None:
+            return self.player.select_move(info_state)
+        # The generators are shared by the whole server process, so other users of them get their
+        # state back afterwards. Threads drawing from them meanwhile still make the moves irreproducible.
+        with _seeded_rngs(self._task_seed(decision, 0)):
+            return self.player.select_move(info_state)
+
+    def _disable_split(self, reason: str):
+        logging.warning(f"Disabling parallel planning for {self.display_name}: {reason}")
+        self.workers = 1
+
+    def select_move(self, info_state):
+        decision = self.decisions
+        self.decisions += 1
+        moves = info_state.possible_moves()
+        if self.workers <= 1 or len(moves) < self.workers * MIN_MOVES_PER_WORKER:
+            return self._select_move_in_process(info_state, decision)
+
+        pool, started_queue = _get_pool()
+        futures = {}
+
+        def submit(allowed: list, task: int) -> Future:
+            token = uuid.uuid4().hex
+            with _task_starts_lock:
+                _task_starts[token] = None
+            try:
+                futures[token] = pool.submit(
+                    _select_move_task, self.player, info_state, allowed, self._task_seed(decision, task), token
+                )
+            except RuntimeError as e:
+                # Another decision shut the pool down after we got it.
+                raise BrokenProcessPool(str(e)) from e
+            return futures[token]
+
+        try:
+            # Interleave the moves so every worker gets a similar mix of cheap and expensive ones.
+            shares = [moves[i::self.workers] for i in range(self.workers)]
+            share_futures = [submit(share, i) for i, share in enumerate(shares)]
+            _wait_for_tasks(futures, started_queue)
+            finalists = []
+            for future in share_futures:
+                move, restricted = future.result()
+                if not restricted:
+                    # The planner does not take its root moves from possible_moves(), so every worker
+                    # searched everything: splitting only multiplies the CPU cost.
+                    self._disable_split("the planner ignored the restricted root moves")
+                    return move
+                if move not in finalists:
+                    finalists.append(move)
+            if len(finalists) == 1:
+                return finalists[0]
+            final_future = submit(finalists, self.workers)
+            _wait_for_tasks(futures, started_queue)
+            move, _ = final_future.result()
+            return move
+        except _TaskHung as e:
+            logging.error(f"{e}, restarting the pool and planning this move in-process")
+            _reset_pool(pool)
+        except (BrokenProcessPool, CancelledError):
+            # Either a worker died, or another decision replaced the pool while this one used it.
+            logging.error("Planning process pool went away, planning this move in-process")
+            _reset_pool(pool)
+        finally:
+            # Only this decision's tasks: queued ones are dropped, running ones finish and are ignored.
+            for future in futures.values():
+                future.cancel()
+            with _task_starts_lock:
+                for token in futures:
+                    _task_starts.pop(token, None)
+        return self._select_move_in_process(info_state, decision)
@@ -0,0 +1,51 @@
+"""
+Registry of the AI players offered by the backend.
+Engine modules and model weights are imported on first use of a player, not at server import,
+so the server can answer its first requests without paying for players nobody picked yet.
+"""
+import copy
+import functools
+import os
+
+import startup_timing
+
+
+@functools.cache
+def _neural_player_prototype():
+    with startup_timing.timed("load NeuralPlayer"):
+        from scout_engine import numpy_neural_player
+        return numpy_neural_player.load_default_player()
+
+
+def _neural_player():
+    # Weights are read from disk once per process; every game gets its own copy.
+    return copy.deepcopy(_neural_player_prototype())
+
+
+@functools.cache
+def _players_module():
+    with startup_timing.timed("import scout_engine.players"):
+        from scout_engine import players
+        return players
+
+
+# Opt-in: with more than one worker, each PlanningPlayer decision is spread over a shared process pool.
+# PLANNING_PARALLEL_SEED makes the moves reproducible; by default they are not seeded.
+PLANNING_PARALLEL_WORKERS = int(os.environ.get("PLANNING_PARALLEL_WORKERS", 1))
+PLANNING_PARALLEL_SEED = os.environ.get("PLANNING_PARALLEL_SEED")
+
+
+def _planning_player():
+    player = _players_module().PlanningPlayer()
+    if PLANNING_PARALLEL_WORKERS <= 1:
+        return player
+    from parallel_planning import ParallelPlanningPlayer
+    seed = int(PLANNING_PARALLEL_SEED) if PLANNING_PARALLEL_SEED is not None else None
+    return ParallelPlanningPlayer(player, PLANNING_PARALLEL_WORKERS, seed)
+
+
+SUPPORTED_PLAYERS = {
+    "NeuralPlayer": _neural_player,
+    "PlanningPlayer": _planning_player,
+    "GreedyShowPlayerWithFlip": lambda: _players_module().GreedyShowPlayerWithFlip()
+}
@@ -2,29 +2,27 @@
 Flask server for Scout card game API.
 Provides HTTP endpoints for game state management and move execution.
 """
+import time
+_import_start = time.perf_counter()
+
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 import uuid
-import time
 import os
 import pickle
-import redis
 import logging
 import re
+import threading
 from typing import Optional
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 from scout_engine.game_state import GameState, MultiRoundGameState, FinishedStatus
-from scout_engine.players import PlanningPlayer, GreedyShowPlayer
-from scout_engine import numpy_neural_player
 from serialization import serialize_multi_round_game_state, serialize_move, deserialize_move
-
-SUPPORTED_PLAYERS = {
-    "NeuralPlayer": lambda: numpy_neural_player.load_default_player(),
-    "PlanningPlayer": lambda: PlanningPlayer(),
-    "GreedyShowPlayerWithFlip": lambda: GreedyShowPlayerWithFlip()
-}
+from admission import AdmissionController, AdmissionRejected, ConcurrencyLimiter, TokenBucketLimiter
+from player_registry import SUPPORTED_PLAYERS
+import startup_timing
 
 app = Flask(__name__)
 # Allow requests from production Vercel domain and local development origins
@@ -32,52 +30,138 @@ CORS(app, origins=[
     "https://scout-app-kappa.vercel.app",
     re.compile(r"^https?://localhost:\d+$"),
     re.compile(r"^https?://127\.0\.0\.1:\d+$")
-], supports_credentials=True)
-
-# Redis setup for session storage
-redis_url = os.environ.get("KV_URL", os.environ.get("REDIS_URL", "redis://localhost:6379"))
-logging.info(f"Using Redis URL: {redis_url}")
-try:
-    redis_client = redis.Redis.from_url(redis_url)
-    logging.info(f"Redis client: {redis_client}")
-    redis_client.ping()
-    logging.info(f"Connected to Redis at {redis_url}")
-except redis.ConnectionError:
-    import fakeredis
-    logging.warning("WARNING: Could not connect to Redis, using fakeredis for local development.")
-    redis_client = fakeredis.FakeRedis()
+], supports_credentials=True, expose_headers=["Retry-After"])
+
+# Number of reverse proxies in front of the app (1 on Vercel). Only the X-Forwarded-For entries those
+# proxies appended are trusted for request.remote_addr; entries sent by the client itself are ignored.
+TRUSTED_PROXY_COUNT = int(os.environ.get("TRUSTED_PROXY_COUNT", 0))
+if TRUSTED_PROXY_COUNT > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_COUNT)
+
+# Redis setup for session storage. REDIS_URLS may list several comma separated
+# instances; sessions are then sharded across them by session_id.
+# Connecting happens on the first request that needs a session, not at import, to keep cold starts fast.
+_session_store = None
+_session_store_lock = threading.Lock()
+
+# How often the background sweep looks for idle sessions to demote, if tiering is enabled.
+DEMOTE_INTERVAL_SECONDS = float(os.environ.get("SESSION_DEMOTE_INTERVAL_SECONDS", 60))
+
+
+def get_session_store():
+    """Return the session store, connecting to Redis on first use."""
+    global _session_store
+    if _session_store is not None:
+        return _session_store
+    with _session_store_lock:
+        if _session_store is None:
+            with startup_timing.timed("connect session store"):
+                from session_store import (
+                    ShardedSessionStore, SqliteColdStore, TieredSessionStore, parse_redis_urls, shard_name
+                )
+                redis_urls = parse_redis_urls(os.environ.get(
+                    "REDIS_URLS", os.environ.get("KV_URL", os.environ.get("REDIS_URL", "redis://localhost:6379"))
+                ))
+                logging.info(f"Using Redis URLs: {[shard_name(url) for url in redis_urls]}")
+                store = ShardedSessionStore.from_urls(redis_urls)
+                # Opt-in: sessions idle for longer than SESSION_IDLE_SECONDS are compressed and moved out of
+                # Redis into a SQLite file, and promoted back on their next access. The file must be shared
+                # by every process serving these sessions, so there is deliberately no default path.
+                cold_store_path = os.environ.get("SESSION_COLD_STORE_PATH")
+                if cold_store_path:
+                    store = TieredSessionStore(
+                        hot=store,
+                        cold=SqliteColdStore(cold_store_path),
+                        idle_seconds=float(os.environ.get("SESSION_IDLE_SECONDS", 900))
+                    )
+            _session_store = store
+            # Scanning every session can take a while, so it must not delay the request that got here first.
+            threading.Thread(target=cleanup_old_sessions, daemon=True).start()
+            if cold_store_path:
+                threading.Thread(target=demote_idle_sessions_forever, daemon=True).start()
+    return _session_store
+
+
+# Admission control for AI work (player creation, hand flips and AI moves). Read-only endpoints
+# such as /state and /list_players never wait on it, so they stay responsive under AI load.
+AI_MAX_CONCURRENCY = int(os.environ.get("AI_MAX_CONCURRENCY", os.cpu_count() or 1))
+admission = AdmissionController(
+    concurrency=ConcurrencyLimiter(
+        max_concurrent=AI_MAX_CONCURRENCY,
+        max_queue=int(os.environ.get("AI_MAX_QUEUE", 2 * AI_MAX_CONCURRENCY)),
+        max_wait_seconds=float(os.environ.get("AI_MAX_WAIT_SECONDS", 5))
+    ),
+    # The frontend auto-advances at most every 100ms; the limits leave headroom for scripted clients like the tests.
+    session_limiter=TokenBucketLimiter(
+        rate=float(os.environ.get("SESSION_AI_RATE", 20)), burst=float(os.environ.get("SESSION_AI_BURST", 40))
+    ),
+    client_limiter=TokenBucketLimiter(
+        rate=float(os.environ.get("CLIENT_AI_RATE", 50)), burst=float(os.environ.get("CLIENT_AI_BURST", 100))
+    )
+)
+
+
+@app.errorhandler(AdmissionRejected)
+def handle_admission_rejected(e: AdmissionRejected):
+    """Reject quickly with 429/503 and a Retry-After hint."""
+    logging.warning(f"Rejected {request.path} with {e.status_code}: {e.reason}")
+    response = jsonify({"error": e.reason})
+    response.status_code = e.status_code
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response
+
+
+def client_id() -> str:
+    """Identify the caller for rate limiting. See TRUSTED_PROXY_COUNT for deployments behind a proxy."""
+    return request.remote_addr or "unknown"
 
 
 def cleanup_old_sessions():
     """Delete sessions created more than 24 hours ago."""
     logging.info("Starting cleanup of old sessions...")
     try:
-        keys = redis_client.keys("session:*")
         deleted_count = 0
         current_time = time.time()
-        for key in keys:
-            data = redis_client.get(key)
+        session_store = get_session_store()
+        hot_store = getattr(session_store, "hot", session_store)
+        for client, key in hot_store.scan_keys():
+            data = client.get(key)
             if data:
                 try:
                     session = pickle.loads(data)
                     created_at = session.get("created_at", 0)
                     if current_time - created_at > 86400:
-                        redis_client.delete(key)
+                        client.delete(key)
                         deleted_count += 1
                 except Exception as e:
                     logging.warning(f"Failed to parse session {key}, deleting it. Error: {e}")
-                    redis_client.delete(key)
+                    client.delete(key)
                     deleted_count += 1
+        if hot_store is not session_store:
+            deleted_count += session_store.delete_expired()
         logging.info(f"Cleaned up {deleted_count} old sessions.")
     except Exception as e:
         logging.error(f"Error during cleanup of old sessions: {e}")
 
-cleanup_old_sessions()
+
+def demote_idle_sessions_forever():
+    """Background loop moving idle sessions to the cold store and dropping expired ones, off the request path."""
+    while True:
+        time.sleep(DEMOTE_INTERVAL_SECONDS)
+        try:
+            demoted = _session_store.demote_idle_sessions()
+            if demoted:
+                logging.info(f"Demoted {demoted} idle sessions to the cold store.")
+            expired = _session_store.delete_expired()
+            if expired:
+                logging.info(f"Deleted {expired} expired sessions from the cold store.")
+        except Exception as e:
+            logging.error(f"Error while demoting idle sessions: {e}")
 
 
 def get_session(session_id: str) -> Optional[dict]:
-    """Retrieve a session from Redis and update last access time."""
-    data = redis_client.get(f"session:{session_id}")
+    """Retrieve a session, promoting it back to Redis if it was demoted, and update last access time."""
+    data = get_session_store().get(session_id)
     if not data:
         return None
     session = pickle.loads(data)
@@ -86,8 +170,8 @@ def get_session(session_id: str) -> Optional[dict]:
 
 
 def save_session(session_id: str, session: dict):
-    """Save a session to Redis with 24h expiration."""
-    redis_client.setex(f"session:{session_id}", 86400, pickle.dumps(session))
+    """Save a session to its Redis shard with 24h expiration."""
+    get_session_store().set(session_id, pickle.dumps(session), 86400)
 
 
 @app.route('/new_game', methods=['POST'])
@@ -121,8 +205,9 @@ def new_game():
     
     # Create AI players (human is player 0, so None for index 0)
     players = [None]
-    for _ in range(num_players - 1):
-        players.append(player_factory())
+    with admission.ai_call(client_id=client_id()):
+        for _ in range(num_players - 1):
+            players.append(player_factory())
     
     # Generate session ID
     session_id = str(uuid.uuid4())
@@ -154,6 +239,41 @@ def list_players():
     })
 
 
+@app.route('/startup_timings', methods=['GET'])
+def startup_timings():
+    """
+    Get how long server import and each lazily loaded component took, in milliseconds.
+    
+    Response:
+    {
+        "import server": float,
+        "connect session store": float,
+        "load NeuralPlayer": float,
+        ...
+    }
+    """
+    return jsonify(startup_timing.report())
+
+
+@app.route('/admission_stats', methods=['GET'])
+def admission_stats():
+    """
+    Get counters of the AI admission control, for monitoring.
+    
+    Response:
+    {
+        "active": int,
+        "queue_depth": int,
+        "admitted": int,
+        "rejected_queue_full": int,
+        "rejected_timeout": int,
+        "rejected_rate_limited": int,
+        ...
+    }
+    """
+    return jsonify(admission.stats())
+
+
 @app.route('/state', methods=['GET'])
 def get_state():
     """
@@ -202,7 +322,8 @@ def get_state():
     # Include player classes for frontend display
     player_classes = ["Human"]
     for i in range(1, multi_round_state.num_players):
-        player_classes.append(players[i].__class__.__name__)
+        # Wrappers such as ParallelPlanningPlayer report the player they wrap.
+        player_classes.append(getattr(players[i], "display_name", players[i].__class__.__name__))
     state_data["player_classes"] = player_classes
     
     # If it's the human player's turn and game is not finished, include possible moves
@@ -306,7 +427,8 @@ def flip_hand():
             flip_fns.append(player.flip_hand)
     
     # Execute flip
-    game_state.maybe_flip_hand(flip_fns)
+    with admission.ai_call(session_id, client_id()):
+        game_state.maybe_flip_hand(flip_fns)
     
     # Save back to Redis
     save_session(session_id, session)
@@ -378,7 +500,8 @@ def advance():
         # AI player's turn - select and execute move
         player = players[current_player]
         info_state = game_state.info_state()
-        move = player.select_move(info_state)
+        with admission.ai_call(session_id, client_id()):
+            move = player.select_move(info_state)
         game_state.move(move)
     
     # Save back to Redis
@@ -390,5 +513,8 @@ def advance():
     })
 
 
+startup_timing.record("import server", time.perf_counter() - _import_start)
+
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
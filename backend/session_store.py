@@ -0,0 +1,361 @@
+"""
+Session storage for the Scout backend.
+Spreads sessions across one or more Redis instances using consistent hashing on session_id,
+and can demote idle sessions to a compressed SQLite store.
+"""
+import bisect
+import contextlib
+import hashlib
+import logging
+import sqlite3
+import time
+import zlib
+from typing import Callable, Iterable, Optional
+from urllib.parse import urlparse
+
+import redis
+
+# Number of points each shard gets on the hash ring. More points give a more even spread.
+DEFAULT_VIRTUAL_NODES = 160
+
+
+def _hash(key: str) -> int:
+    """Stable 64-bit hash; Python's hash() is salted per process and unusable here."""
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+def shard_name(url: str) -> str:
+    """
+    Derive a stable shard identity from a Redis URL.
+    Credentials are dropped so rotating a password does not move sessions around.
+    """
+    parsed = urlparse(url)
+    host = parsed.hostname or "localhost"
+    port = parsed.port or 6379
+    db = parsed.path.lstrip("/") or "0"
+    return f"{host}:{port}/{db}"
+
+
+def parse_redis_urls(value: str) -> list[str]:
+    """Split a comma separated list of Redis URLs, ignoring blanks."""
+    return [url.strip() for url in value.split(",") if url.strip()]
+
+
+class HashRing:
+    """Consistent hash ring mapping keys to shard names."""
+
+    def __init__(self, names: Iterable[str], virtual_nodes: int = DEFAULT_VIRTUAL_NODES):
+        self._points: list[int] = []
+        self._owners: list[str] = []
+        ring = sorted(
+            (_hash(f"{name}#{i}"), name)
+            for name in names
+            for i in range(virtual_nodes)
+        )
+        for point, name in ring:
+            self._points.append(point)
+            self._owners.append(name)
+        if not self._points:
+            raise ValueError("HashRing needs at least one shard")
+
+    def owner(self, key: str) -> str:
+        """Return the shard responsible for key."""
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[index]
+
+
+class ShardedSessionStore:
+    """
+    Stores pickled sessions as raw bytes across several Redis shards.
+
+    Each shard has its own connection pool. When shards are added, only the sessions
+    whose ring position moved are affected, and those are migrated lazily: a miss on
+    the owning shard falls back to the other shards and moves the session over.
+    """
+
+    KEY_PREFIX = "session:"
+    # Lifetime given to migrated sessions that had no expiry on their old shard.
+    DEFAULT_TTL_SECONDS = 86400
+    # Per-session lock keys held while a session is being demoted; they expire in case a sweeper dies.
+    DEMOTE_LOCK_PREFIX = "session_demote_lock:"
+    DEMOTE_LOCK_SECONDS = 60
+    # Sorted set per shard holding session ids scored by their last access time.
+    ACCESS_KEY = "session_access"
+
+    def __init__(self, clients: dict[str, redis.Redis], migrate_on_miss: bool = True,
+                 virtual_nodes: int = DEFAULT_VIRTUAL_NODES):
+        if not clients:
+            raise ValueError("ShardedSessionStore needs at least one shard")
+        self.clients = clients
+        self.migrate_on_miss = migrate_on_miss
+        self._ring = HashRing(clients.keys(), virtual_nodes)
+
+    @classmethod
+    def from_urls(cls, urls: list[str], max_connections: Optional[int] = None,
+                  fallback_to_fakeredis: bool = True, **kwargs) -> "ShardedSessionStore":
+        """
+        Build a store with one connection pool per Redis URL.
+        A single unreachable URL is replaced by fakeredis for local development. With several
+        shards an unreachable one raises instead, since falling back would silently keep part
+        of the sessions in process memory.
+        """
+        clients = {}
+        for url in urls:
+            name = shard_name(url)
+            pool = redis.ConnectionPool.from_url(url, max_connections=max_connections)
+            client = redis.Redis(connection_pool=pool)
+            try:
+                client.ping()
+                logging.info(f"Connected to Redis shard {name}")
+            except redis.ConnectionError:
+                if not fallback_to_fakeredis or len(urls) > 1:
+                    raise
+                import fakeredis
+                logging.warning("WARNING: Could not connect to Redis, using fakeredis for local development.")
+                client = fakeredis.FakeRedis()
+            clients[name] = client
+        return cls(clients, **kwargs)
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.KEY_PREFIX}{session_id}"
+
+    def shard_for(self, session_id: str) -> str:
+        """Name of the shard that owns session_id."""
+        return self._ring.owner(session_id)
+
+    def client_for(self, session_id: str) -> redis.Redis:
+        """Redis client of the shard that owns session_id."""
+        return self.clients[self.shard_for(session_id)]
+
+    def get(self, session_id: str) -> Optional[bytes]:
+        """Fetch the raw session bytes, migrating them to the owning shard if found elsewhere."""
+        key = self._key(session_id)
+        owner = self.shard_for(session_id)
+        data = self.clients[owner].get(key)
+        if data is not None or not self.migrate_on_miss or len(self.clients) == 1:
+            return data
+        return self._migrate_from_other_shards(session_id)
+
+    def _migrate_from_other_shards(self, session_id: str) -> Optional[bytes]:
+        """Look for a session on the non-owning shards and move it to its owner."""
+        key = self._key(session_id)
+        owner = self.shard_for(session_id)
+        for name, client in self.clients.items():
+            if name == owner:
+                continue
+            # Read value and TTL in one transaction, so the key cannot expire in between.
+            pipe = client.pipeline()
+            pipe.get(key)
+            pipe.ttl(key)
+            data, ttl = pipe.execute()
+            if data is None or ttl == -2:
+                continue
+            if ttl is None or ttl <= 0:
+                ttl = self.DEFAULT_TTL_SECONDS
+            # Only copy if the owner has nothing yet: a concurrent request may already have migrated
+            # the session and saved a newer state there, which the stale copy must not overwrite.
+            migrated = self.clients[owner].set(key, data, ex=ttl, nx=True)
+            client.delete(key)
+            client.zrem(self.ACCESS_KEY, session_id)
+            if not migrated:
+                return self.clients[owner].get(key)
+            logging.info(f"Migrated session {session_id} from shard {name} to {owner}")
+            return data
+        return None
+
+    def set(self, session_id: str, data: bytes, ttl_seconds: int):
+        """Store raw session bytes on the owning shard with an expiry."""
+        self.client_for(session_id).setex(self._key(session_id), ttl_seconds, data)
+
+    def set_if_absent(self, session_id: str, data: bytes, ttl_seconds: int) -> bool:
+        """Store raw session bytes on the owning shard unless it already holds the session."""
+        return bool(self.client_for(session_id).set(self._key(session_id), data, ex=ttl_seconds, nx=True))
+
+    def ttl(self, session_id: str) -> Optional[int]:
+        """Remaining lifetime in seconds of a session on its owning shard, None if it does not expire."""
+        ttl = self.client_for(session_id).ttl(self._key(session_id))
+        return ttl if ttl is not None and ttl >= 0 else None
+
+    def touch(self, session_id: str, timestamp: float):
+        """Record the last access time of a session in its shard's access index."""
+        self.client_for(session_id).zadd(self.ACCESS_KEY, {session_id: timestamp})
+
+    def idle_session_ids(self, cutoff: float, limit: int = 100) -> list[str]:
+        """Return up to limit session ids per shard that were last accessed before cutoff."""
+        session_ids = []
+        for client in self.clients.values():
+            for session_id in client.zrangebyscore(self.ACCESS_KEY, "-inf", cutoff, start=0, num=limit):
+                session_ids.append(session_id.decode() if isinstance(session_id, bytes) else session_id)
+        return session_ids
+
+    def pop_if_idle(self, session_id: str, cutoff: float,
+                    archive: Callable[[bytes, Optional[int]], None], unarchive: Callable[[], None]) -> bool:
+        """
+        Remove a session that was last accessed before cutoff, handing its bytes and remaining TTL
+        to archive first. If the session is written while this runs, it stays in Redis and
+        unarchive is called to drop the archived copy. Returns True if the session was removed.
+        """
+        key = self._key(session_id)
+        client = self.client_for(session_id)
+        # Several processes sweep the same shards; only one of them may demote a given session at a time.
+        lock_key = f"{self.DEMOTE_LOCK_PREFIX}{session_id}"
+        if not client.set(lock_key, b"1", ex=self.DEMOTE_LOCK_SECONDS, nx=True):
+            return False
+        try:
+            with client.pipeline() as pipe:
+                try:
+                    pipe.watch(key)
+                    score = pipe.zscore(self.ACCESS_KEY, session_id)
+                    if score is not None and score > cutoff:
+                        return False
+                    data = pipe.get(key)
+                    if data is None:
+                        # Expired in Redis already; only the index entry is left.
+                        pipe.multi()
+                        pipe.zrem(self.ACCESS_KEY, session_id)
+                        pipe.execute()
+                        return False
+                    ttl = pipe.ttl(key)
+                    archive(data, ttl if ttl is not None and ttl >= 0 else None)
+                    pipe.multi()
+                    pipe.delete(key)
+                    pipe.zrem(self.ACCESS_KEY, session_id)
+                    pipe.execute()
+                    return True
+                except redis.WatchError:
+                    # Drop the archived copy only while Redis still holds the authoritative one;
+                    # otherwise the archived copy may be the only one left.
+                    if client.exists(key):
+                        unarchive()
+                    return False
+        finally:
+            client.delete(lock_key)
+
+    def delete(self, session_id: str):
+        """Remove a session from every shard."""
+        key = self._key(session_id)
+        for client in self.clients.values():
+            client.delete(key)
+            client.zrem(self.ACCESS_KEY, session_id)
+
+    def scan_keys(self) -> Iterable[tuple[redis.Redis, bytes]]:
+        """Yield (client, key) for every session key on every shard."""
+        for client in self.clients.values():
+            for key in client.scan_iter(match=f"{self.KEY_PREFIX}*"):
+                yield client, key
+
+
+class SqliteColdStore:
+    """
+    Compressed session store in a SQLite file, used for sessions that went idle.
+    Rows keep the expiry time the session had in Redis so the 24h lifetime is preserved.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, data BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # A short lived connection per operation keeps this safe to use from any request thread.
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def put(self, session_id: str, data: bytes, expires_at: float):
+        """Compress and store session bytes."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, data, expires_at) VALUES (?, ?, ?)",
+                (session_id, zlib.compress(data), expires_at)
+            )
+
+    def get(self, session_id: str) -> Optional[tuple[bytes, float]]:
+        """Return the decompressed session bytes and their expiry time, if present."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT data, expires_at FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return zlib.decompress(row[0]), row[1]
+
+    def delete(self, session_id: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def delete_expired(self, now: float) -> int:
+        """Drop sessions whose expiry has passed. Returns the number of deleted sessions."""
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,)).rowcount
+
+
+class TieredSessionStore:
+    """
+    Keeps active sessions in Redis and moves sessions idle for longer than idle_seconds
+    into a cold store. A read of a demoted session promotes it back into Redis.
+
+    Every process serving these sessions must use the same cold store; a session demoted
+    into a file another process cannot read can no longer be resumed there.
+    """
+
+    def __init__(self, hot: ShardedSessionStore, cold: SqliteColdStore, idle_seconds: float):
+        self.hot = hot
+        self.cold = cold
+        self.idle_seconds = idle_seconds
+
+    def get(self, session_id: str) -> Optional[bytes]:
+        """Fetch session bytes from Redis, promoting them from the cold store if needed."""
+        now = time.time()
+        data = self.hot.get(session_id)
+        if data is None:
+            cold = self.cold.get(session_id)
+            if cold is None:
+                return None
+            data, expires_at = cold
+            if expires_at <= now:
+                self.cold.delete(session_id)
+                return None
+            promoted = self.hot.set_if_absent(session_id, data, max(1, int(expires_at - now)))
+            self.cold.delete(session_id)
+            if not promoted:
+                # A concurrent request promoted it first and may already have saved a newer state.
+                data = self.hot.get(session_id)
+                if data is None:
+                    return None
+            else:
+                logging.info(f"Promoted session {session_id} from cold store")
+        self.hot.touch(session_id, now)
+        return data
+
+    def set(self, session_id: str, data: bytes, ttl_seconds: int):
+        self.hot.set(session_id, data, ttl_seconds)
+        self.hot.touch(session_id, time.time())
+
+    def demote_idle_sessions(self, limit: int = 100) -> int:
+        """Move sessions idle past the threshold to the cold store. Returns the number demoted."""
+        now = time.time()
+        cutoff = now - self.idle_seconds
+        demoted = 0
+        for session_id in self.hot.idle_session_ids(cutoff, limit):
+            def archive(data: bytes, ttl: Optional[int]):
+                self.cold.put(session_id, data, now + (ttl if ttl is not None else self.hot.DEFAULT_TTL_SECONDS))
+
+            def unarchive():
+                self.cold.delete(session_id)
+
+            if self.hot.pop_if_idle(session_id, cutoff, archive, unarchive):
+                demoted += 1
+        return demoted
+
+    def delete_expired(self) -> int:
+        """Drop expired sessions from the cold store; Redis expires its keys by itself."""
+        return self.cold.delete_expired(time.time())
@@ -0,0 +1,34 @@
+"""
+Startup timing report for the Scout backend.
+Records how long module import and each lazily loaded component took, so cold starts can be tracked.
+"""
+import contextlib
+import logging
+import threading
+import time
+
+_timings: dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def record(name: str, seconds: float):
+    """Record the duration of a startup phase and log it."""
+    with _lock:
+        _timings[name] = seconds
+    logging.info(f"Startup timing: {name} took {seconds * 1000:.1f} ms")
+
+
+@contextlib.contextmanager
+def timed(name: str):
+    """Record the duration of the with-block under name."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def report() -> dict[str, float]:
+    """Return all recorded phases in milliseconds."""
+    with _lock:
+        return {name: round(seconds * 1000, 1) for name, seconds in _timings.items()}
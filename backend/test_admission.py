@@ -0,0 +1,112 @@
+"""
+Tests for admission control of AI-heavy endpoints.
+"""
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected, ConcurrencyLimiter, TokenBucketLimiter
+
+
+def test_token_bucket_allows_burst_then_rejects():
+    limiter = TokenBucketLimiter(rate=1, burst=3)
+    for _ in range(3):
+        limiter.check("a")
+    with pytest.raises(AdmissionRejected) as excinfo:
+        limiter.check("a")
+    assert excinfo.value.status_code == 429
+    assert excinfo.value.retry_after >= 1
+    # Other keys have their own bucket.
+    limiter.check("b")
+
+
+def test_token_bucket_refills():
+    limiter = TokenBucketLimiter(rate=50, burst=1)
+    limiter.check("a")
+    with pytest.raises(AdmissionRejected):
+        limiter.check("a")
+    time.sleep(0.05)
+    limiter.check("a")
+
+
+def hold_slots(limiter: ConcurrencyLimiter, count: int):
+    """Occupy count slots from background threads until the returned event is set."""
+    release = threading.Event()
+    started = threading.Barrier(count + 1)
+
+    def hold():
+        with limiter.slot():
+            started.wait()
+            release.wait()
+
+    threads = [threading.Thread(target=hold) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    started.wait()
+    return release, threads
+
+
+def test_concurrency_limit_times_out_waiters():
+    limiter = ConcurrencyLimiter(max_concurrent=1, max_queue=1, max_wait_seconds=0.05)
+    release, threads = hold_slots(limiter, 1)
+    try:
+        with pytest.raises(AdmissionRejected) as excinfo:
+            with limiter.slot():
+                pass
+        assert excinfo.value.status_code == 503
+        assert limiter.stats()["rejected_timeout"] == 1
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join()
+    with limiter.slot():
+        assert limiter.stats()["active"] == 1
+    assert limiter.stats()["active"] == 0
+
+
+def test_concurrency_limit_rejects_when_queue_full():
+    limiter = ConcurrencyLimiter(max_concurrent=1, max_queue=0, max_wait_seconds=5)
+    release, threads = hold_slots(limiter, 1)
+    try:
+        start = time.monotonic()
+        with pytest.raises(AdmissionRejected):
+            with limiter.slot():
+                pass
+        # Rejection must not wait for max_wait_seconds.
+        assert time.monotonic() - start < 1
+        assert limiter.stats()["rejected_queue_full"] == 1
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join()
+
+
+def test_waiter_is_admitted_when_slot_frees_up():
+    limiter = ConcurrencyLimiter(max_concurrent=1, max_queue=1, max_wait_seconds=5)
+    release, threads = hold_slots(limiter, 1)
+    threading.Timer(0.05, release.set).start()
+    with limiter.slot():
+        pass
+    for thread in threads:
+        thread.join()
+    stats = limiter.stats()
+    assert stats["admitted"] == 2
+    assert stats["max_queue_depth_seen"] == 1
+    assert stats["queue_depth"] == 0
+
+
+def test_controller_counts_rate_limited_requests():
+    controller = AdmissionController(
+        concurrency=ConcurrencyLimiter(max_concurrent=2, max_queue=2, max_wait_seconds=1),
+        session_limiter=TokenBucketLimiter(rate=1, burst=1),
+        client_limiter=TokenBucketLimiter(rate=100, burst=100)
+    )
+    with controller.ai_call("session", "client"):
+        pass
+    with pytest.raises(AdmissionRejected):
+        with controller.ai_call("session", "client"):
+            pass
+    stats = controller.stats()
+    assert stats["rejected_rate_limited"] == 1
+    assert stats["admitted"] == 1
@@ -0,0 +1,178 @@
+"""
+Tests for the position corpus and latency statistics of the player benchmark.
+"""
+import json
+import pickle
+import sys
+import types
+
+import fakeredis
+import pytest
+
+import bench_players
+from bench_players import (
+    CORPUS_VERSION, benchmark_player, group_latencies, load_state, make_position, percentile, read_corpus,
+    simulate_positions, summarize, write_corpus
+)
+
+
+class StubInfoState:
+    def __init__(self, hand):
+        self.hand = hand
+
+    def possible_moves(self):
+        return list(range(len(self.hand)))
+
+
+class StubPlayer:
+    """Plays the first card of its hand; never flips."""
+
+    def select_move(self, info_state):
+        return info_state.possible_moves()[0]
+
+    def flip_hand(self, hand):
+        return False
+
+
+class StubGameState:
+    """A one-round game where players take turns discarding a card onto the table."""
+
+    def __init__(self, num_players):
+        self.num_players = num_players
+        self.current_player = 0
+        self.hands = [[(i, i + 1) for i in range(3)] for _ in range(num_players)]
+        self.table = []
+        self.initial_flip_executed = False
+
+    def maybe_flip_hand(self, flip_fns):
+        for flip_fn, hand in zip(flip_fns, self.hands):
+            flip_fn(hand)
+        self.initial_flip_executed = True
+
+    def is_finished(self):
+        return not any(self.hands)
+
+    def info_state(self):
+        return StubInfoState(list(self.hands[self.current_player]))
+
+    def move(self, index):
+        self.table = [self.hands[self.current_player].pop(index)]
+        self.current_player = (self.current_player + 1) % self.num_players
+
+
+class StubMultiRoundGameState:
+    def __init__(self, num_players):
+        self.game_state = StubGameState(num_players)
+
+    def next_round(self):
+        return False
+
+
+@pytest.fixture
+def stub_players(monkeypatch):
+    monkeypatch.setitem(bench_players.SUPPORTED_PLAYERS, "StubPlayer", StubPlayer)
+    engine = types.ModuleType("scout_engine")
+    game_state = types.ModuleType("scout_engine.game_state")
+    game_state.MultiRoundGameState = StubMultiRoundGameState
+    engine.game_state = game_state
+    monkeypatch.setitem(sys.modules, "scout_engine", engine)
+    monkeypatch.setitem(sys.modules, "scout_engine.game_state", game_state)
+
+
+def test_corpus_roundtrip(tmp_path):
+    path = str(tmp_path / "positions.jsonl")
+    positions = [make_position("flip", [(1, 2), (3, 4)], 3, 2, 0), make_position("move", {"any": "state"}, 4, 9, 2)]
+    assert write_corpus(path, iter(positions), "test") == 2
+
+    header, loaded = read_corpus(path)
+    assert header["version"] == CORPUS_VERSION
+    assert header["source"] == "test"
+    assert loaded == positions
+    assert load_state(loaded[0]) == [(1, 2), (3, 4)]
+    assert load_state(loaded[1]) == {"any": "state"}
+
+
+def test_read_corpus_rejects_other_versions(tmp_path):
+    path = tmp_path / "positions.jsonl"
+    path.write_text(json.dumps({"format": "scout-position-corpus", "version": CORPUS_VERSION + 1}) + "\n")
+    with pytest.raises(ValueError):
+        read_corpus(str(path))
+
+
+def test_percentile_and_summary():
+    values = list(range(1, 101))
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.99) == 99
+    assert percentile([7], 0.9) == 7
+
+    summary = summarize([0.001, 0.002, 0.003])
+    assert summary["n"] == 3
+    assert summary["p50_ms"] == pytest.approx(2)
+    assert summary["max_ms"] == pytest.approx(3)
+
+
+def test_group_latencies():
+    samples = [
+        ({"hand_size": 9}, 0.001),
+        ({"hand_size": 9}, 0.003),
+        ({"hand_size": 4}, 0.002)
+    ]
+    groups = group_latencies(samples, "hand_size")
+    assert list(groups) == [4, 9]
+    assert groups[9]["n"] == 2
+    assert groups[9]["mean_ms"] == pytest.approx(2)
+
+
+def test_simulate_positions_records_flips_and_moves(stub_players):
+    positions = list(simulate_positions(2, [3, 4], "StubPlayer"))
+    flips = [p for p in positions if p["kind"] == "flip"]
+    moves = [p for p in positions if p["kind"] == "move"]
+    assert len(flips) == 3 + 4
+    assert len(moves) == 3 * 3 + 4 * 3
+    assert {p["num_players"] for p in moves} == {3, 4}
+    assert {p["hand_size"] for p in moves} == {1, 2, 3}
+    assert {p["table_length"] for p in moves} == {0, 1}
+    assert isinstance(load_state(moves[0]), StubInfoState)
+
+
+def test_benchmark_player_reports_per_kind_groups(stub_players):
+    positions = list(simulate_positions(1, [3], "StubPlayer"))
+    result = benchmark_player(StubPlayer, positions, repeat=2)
+
+    assert result["peak_memory_mb"] > 0
+    assert result["flip"]["overall"]["n"] == 3 * 2
+    assert result["move"]["overall"]["n"] == 9 * 2
+    assert list(result["move"]["by_hand_size"]) == [1, 2, 3]
+    assert result["move"]["by_hand_size"][3]["n"] == 3 * 2
+    assert list(result["move"]["by_num_players"]) == [3]
+    assert list(result["flip"]["by_table_length"]) == [0]
+    report = bench_players.format_report({"StubPlayer": result})
+    assert "select_move by hand_size" in report
+    assert "flip_hand overall" in report
+
+
+def test_session_positions_reads_redis_without_the_server(monkeypatch):
+    import session_store
+
+    store = session_store.ShardedSessionStore({"local": fakeredis.FakeRedis(server=fakeredis.FakeServer())})
+    in_round = StubMultiRoundGameState(3)
+    in_round.game_state.maybe_flip_hand([lambda hand: False] * 3)
+    store.set("in-round", pickle.dumps({"multi_round_state": in_round}), 60)
+    store.set("not-flipped", pickle.dumps({"multi_round_state": StubMultiRoundGameState(3)}), 60)
+    store.set("unreadable", b"garbage", 60)
+
+    from_urls_kwargs = {}
+
+    def from_urls(urls, **kwargs):
+        from_urls_kwargs.update(kwargs)
+        return store
+
+    monkeypatch.setattr(session_store.ShardedSessionStore, "from_urls", from_urls)
+    monkeypatch.delitem(sys.modules, "server", raising=False)
+    positions = list(bench_players.session_positions())
+
+    assert [p["hand_size"] for p in positions] == [3]
+    assert from_urls_kwargs == {"fallback_to_fakeredis": False, "migrate_on_miss": False}
+    # Reading the corpus neither starts the server's maintenance threads nor deletes what it cannot read.
+    assert "server" not in sys.modules
+    assert store.get("unreadable") == b"garbage"
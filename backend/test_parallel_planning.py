@@ -0,0 +1,197 @@
+"""
+Tests for parallel PlanningPlayer move selection, using stand-in players and states.
+They are defined at module level so the spawned pool workers can unpickle them.
+"""
+import multiprocessing
+import pickle
+import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import parallel_planning
+from parallel_planning import ParallelPlanningPlayer, RestrictedInfoState
+
+
+class FakeInfoState:
+    def __init__(self, moves):
+        self.moves = moves
+        self.current_player = 1
+
+    def possible_moves(self, coalesce=True):
+        return list(self.moves)
+
+
+class BestMovePlayer:
+    """Deterministic planner: the highest move wins. Counts its decisions like a stateful player."""
+
+    def __init__(self):
+        self.decisions = 0
+
+    def select_move(self, info_state):
+        self.decisions += 1
+        return max(info_state.possible_moves())
+
+    def flip_hand(self, hand):
+        return len(hand) > 5
+
+
+class FullSearchPlayer:
+    """Ignores possible_moves() and always searches its own copy of the moves."""
+
+    def select_move(self, info_state):
+        return max(info_state.moves)
+
+
+class HangingPlayer(BestMovePlayer):
+    """Hangs in pool workers, but plans normally in the server process."""
+
+    def select_move(self, info_state):
+        if multiprocessing.current_process().name != "MainProcess":
+            time.sleep(60)
+        return super().select_move(info_state)
+
+
+class SlowPlayer(BestMovePlayer):
+    """Takes a while per decision in pool workers."""
+
+    def select_move(self, info_state):
+        if multiprocessing.current_process().name != "MainProcess":
+            time.sleep(0.3)
+        return super().select_move(info_state)
+
+
+class RandomPlayer:
+    def select_move(self, info_state):
+        return random.choice(info_state.possible_moves())
+
+    def flip_hand(self, hand):
+        return False
+
+
+def test_restricted_info_state_offers_only_allowed_moves():
+    info_state = FakeInfoState(range(10))
+    restricted = RestrictedInfoState(info_state, [2, 5])
+    assert restricted.possible_moves() == [2, 5]
+    assert restricted.current_player == 1
+    # Falls back to all moves if none of them match.
+    fallback = RestrictedInfoState(info_state, [42])
+    assert fallback.possible_moves() == list(range(10))
+    assert fallback.fallbacks == 1
+    assert restricted.fallbacks == 0
+    assert pickle.loads(pickle.dumps(restricted)).possible_moves() == [2, 5]
+
+
+def test_parallel_selection_finds_the_best_move():
+    player = ParallelPlanningPlayer(BestMovePlayer(), workers=3, seed=1)
+    moves = [7, 3, 40, 12, 5, 9, 1, 33, 2, 8, 6, 4, 11, 0]
+    assert player.select_move(FakeInfoState(moves)) == 40
+    assert player.decisions == 1
+    # Workers plan on copies; state they build up is not kept.
+    assert player.player.decisions == 0
+
+
+def test_few_moves_are_planned_in_process():
+    player = ParallelPlanningPlayer(BestMovePlayer(), workers=4, seed=1)
+    assert player.select_move(FakeInfoState([1, 2, 3])) == 3
+    assert player.player.decisions == 1
+
+
+def test_in_process_decisions_are_deterministic_with_seed():
+    info_state = FakeInfoState(range(5))
+    first = ParallelPlanningPlayer(RandomPlayer(), workers=2, seed=7)
+    second = ParallelPlanningPlayer(RandomPlayer(), workers=2, seed=7)
+    assert [first.select_move(info_state) for _ in range(5)] == [second.select_move(info_state) for _ in range(5)]
+
+
+def test_split_is_disabled_when_planner_ignores_restriction():
+    player = ParallelPlanningPlayer(FullSearchPlayer(), workers=2, seed=1)
+    assert player.select_move(FakeInfoState(range(20))) == 19
+    assert player.workers == 1
+
+
+def test_in_process_seeding_restores_global_generators():
+    random.seed(99)
+    expected = random.random()
+    random.seed(99)
+    assert ParallelPlanningPlayer(RandomPlayer(), workers=2, seed=7).select_move(FakeInfoState(range(5))) in range(5)
+    assert random.random() == expected
+
+
+def test_hung_worker_times_out_and_move_is_planned_in_process(monkeypatch):
+    monkeypatch.setattr(parallel_planning, "TASK_TIMEOUT_SECONDS", 0.5)
+    pool, _ = parallel_planning._get_pool()
+    player = ParallelPlanningPlayer(HangingPlayer(), workers=2, seed=1)
+    start = time.monotonic()
+    assert player.select_move(FakeInfoState(range(20))) == 19
+    assert time.monotonic() - start < 10
+    assert parallel_planning._pool is not pool
+    assert parallel_planning._task_starts == {}
+
+
+def test_queued_tasks_do_not_time_out_or_reset_the_pool(monkeypatch):
+    monkeypatch.setattr(parallel_planning, "TASK_TIMEOUT_SECONDS", 1.0)
+    monkeypatch.setenv("PLANNING_POOL_SIZE", "1")
+    parallel_planning._reset_pool(parallel_planning._pool)
+    pool, _ = parallel_planning._get_pool()
+    try:
+        # Three decisions of three 0.3s tasks each on a single worker: most tasks queue for over a second.
+        results = []
+
+        def decide():
+            player = ParallelPlanningPlayer(SlowPlayer(), workers=2, seed=1)
+            results.append(player.select_move(FakeInfoState(range(20))))
+
+        threads = [threading.Thread(target=decide) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == [19, 19, 19]
+        assert parallel_planning._pool is pool
+    finally:
+        parallel_planning._reset_pool(pool)
+
+
+def test_reset_pool_keeps_a_pool_another_thread_swapped_in(monkeypatch):
+    replacement = object()
+    monkeypatch.setattr(parallel_planning, "_pool", replacement)
+    with ProcessPoolExecutor(max_workers=1) as stale:
+        parallel_planning._reset_pool(stale)
+    assert parallel_planning._pool is replacement
+
+
+def test_same_seed_gives_same_moves():
+    info_state = FakeInfoState(range(100))
+    first = ParallelPlanningPlayer(RandomPlayer(), workers=2, seed=123)
+    second = ParallelPlanningPlayer(RandomPlayer(), workers=2, seed=123)
+    first_moves = [first.select_move(info_state) for _ in range(3)]
+    second_moves = [second.select_move(info_state) for _ in range(3)]
+    assert first_moves == second_moves
+
+
+def test_flip_hand_is_delegated():
+    player = ParallelPlanningPlayer(BestMovePlayer(), workers=2, seed=1)
+    assert player.flip_hand(list(range(9))) is True
+
+
+def test_display_name_is_the_wrapped_player():
+    assert ParallelPlanningPlayer(BestMovePlayer(), workers=2).display_name == "BestMovePlayer"
+
+
+def test_real_planning_player_respects_restricted_moves():
+    players = pytest.importorskip("scout_engine.players")
+    from scout_engine.game_state import MultiRoundGameState
+
+    game_state = MultiRoundGameState(3).game_state
+    game_state.maybe_flip_hand([lambda hand: False] * 3)
+    info_state = game_state.info_state()
+    moves = info_state.possible_moves()
+    share = moves[::3]
+    restricted = RestrictedInfoState(info_state, share)
+
+    move = players.PlanningPlayer().select_move(restricted)
+    assert restricted.fallbacks == 0
+    assert move in share
@@ -0,0 +1,108 @@
+"""
+Tests for admission control on the server's endpoints, using Flask's test client
+and a fakeredis session store, with small limits so saturation is easy to reach.
+"""
+import time
+
+import fakeredis
+import pytest
+
+import server
+from admission import AdmissionController, ConcurrencyLimiter, TokenBucketLimiter
+from session_store import ShardedSessionStore
+from test_admission import hold_slots
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(server, "_session_store", ShardedSessionStore(
+        {"local": fakeredis.FakeRedis(server=fakeredis.FakeServer())}
+    ))
+    monkeypatch.setattr(server, "admission", AdmissionController(
+        concurrency=ConcurrencyLimiter(max_concurrent=1, max_queue=0, max_wait_seconds=0.1),
+        session_limiter=TokenBucketLimiter(rate=100, burst=100),
+        client_limiter=TokenBucketLimiter(rate=100, burst=100)
+    ))
+    return server.app.test_client()
+
+
+def new_game(client) -> str:
+    response = client.post("/new_game", json={"num_players": 3, "opponent_type": "PlanningPlayer"})
+    assert response.status_code == 200
+    return response.get_json()["session_id"]
+
+
+def start_ai_turn(client) -> str:
+    """Create a game, flip, and play the human's first move, so an AI player is up next."""
+    session_id = new_game(client)
+    assert client.post("/flip_hand", json={"session_id": session_id, "flip": False}).status_code == 200
+    move = client.get("/state", query_string={"session_id": session_id}).get_json()["possible_moves"][0]
+    assert client.post("/advance", json={"session_id": session_id, "move": move}).status_code == 200
+    return session_id
+
+
+def test_flip_hand_rejected_when_ai_slots_full_while_reads_stay_available(client):
+    session_id = new_game(client)
+    release, threads = hold_slots(server.admission.concurrency, 1)
+    try:
+        response = client.post("/flip_hand", json={"session_id": session_id, "flip": False})
+        assert response.status_code == 503
+        assert int(response.headers["Retry-After"]) >= 1
+
+        start = time.monotonic()
+        assert client.get("/state", query_string={"session_id": session_id}).status_code == 200
+        assert client.get("/list_players").status_code == 200
+        # Neither read waited for an AI slot.
+        assert time.monotonic() - start < server.admission.concurrency.max_wait_seconds
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join()
+
+
+def test_advance_rejected_when_ai_slots_full(client):
+    session_id = start_ai_turn(client)
+    release, threads = hold_slots(server.admission.concurrency, 1)
+    try:
+        response = client.post("/advance", json={"session_id": session_id})
+        assert response.status_code == 503
+        assert "Retry-After" in response.headers
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join()
+    assert client.post("/advance", json={"session_id": session_id}).status_code == 200
+
+
+def test_advance_rate_limited_per_session(client, monkeypatch):
+    session_id = start_ai_turn(client)
+    monkeypatch.setattr(server.admission, "session_limiter", TokenBucketLimiter(rate=0.1, burst=1))
+    assert client.post("/advance", json={"session_id": session_id}).status_code == 200
+
+    state = client.get("/state", query_string={"session_id": session_id}).get_json()
+    if state["multi_round_game_state"]["round_state"]["current_player"] == 0:
+        pytest.skip("Human is up again; no further AI move to rate limit")
+    response = client.post("/advance", json={"session_id": session_id})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_admission_stats_counts_rejections(client):
+    session_id = new_game(client)
+    release, threads = hold_slots(server.admission.concurrency, 1)
+    try:
+        client.post("/flip_hand", json={"session_id": session_id, "flip": False})
+        stats = client.get("/admission_stats").get_json()
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join()
+    assert stats["active"] == 1
+    assert stats["rejected_queue_full"] == 1
+    assert stats["rejected_rate_limited"] == 0
+
+
+def test_client_id_ignores_forwarded_for_without_trusted_proxy():
+    headers = {"X-Forwarded-For": "1.2.3.4"}
+    with server.app.test_request_context("/", headers=headers, environ_base={"REMOTE_ADDR": "10.0.0.1"}):
+        assert server.client_id() == "10.0.0.1"
@@ -0,0 +1,59 @@
+"""
+Cold start tests: importing the server must stay cheap, and the first cheap requests
+must not pull in AI players, model weights or a Redis connection.
+Each check runs in a fresh interpreter so nothing is already imported.
+"""
+import json
+import os
+import subprocess
+import sys
+
+# Generous enough for slow CI machines, tight enough to catch an eagerly loaded model.
+IMPORT_BUDGET_SECONDS = 1.0
+FIRST_REQUEST_BUDGET_SECONDS = 0.1
+
+HEAVY_MODULES = ["scout_engine.players", "scout_engine.numpy_neural_player", "redis", "fakeredis"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import server
+import_seconds = time.perf_counter() - start
+client = server.app.test_client()
+start = time.perf_counter()
+response = client.get("/list_players")
+list_players_seconds = time.perf_counter() - start
+print(json.dumps({
+    "import_seconds": import_seconds,
+    "list_players_seconds": list_players_seconds,
+    "list_players_status": response.status_code,
+    "players": response.get_json()["players"],
+    "loaded": [name for name in %r if name in sys.modules],
+    "session_store_connected": server._session_store is not None,
+    "timings": server.startup_timing.report()
+}))
+""" % (HEAVY_MODULES,)
+
+
+def run_probe() -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_import_and_list_players_stay_within_budget():
+    probe = run_probe()
+    assert probe["import_seconds"] < IMPORT_BUDGET_SECONDS, probe["timings"]
+    assert probe["list_players_status"] == 200
+    assert probe["list_players_seconds"] < FIRST_REQUEST_BUDGET_SECONDS
+    assert probe["players"] == ["NeuralPlayer", "PlanningPlayer", "GreedyShowPlayerWithFlip"]
+
+
+def test_heavy_modules_load_lazily():
+    probe = run_probe()
+    assert probe["loaded"] == []
+    assert probe["session_store_connected"] is False
+    assert "import server" in probe["timings"]
@@ -15,6 +15,22 @@ function logAPI(method, endpoint, params, result) {
     });
 }
 
+/**
+ * fetch() wrapper for AI-heavy endpoints. When the backend is saturated it answers
+ * 429/503 with a Retry-After header; wait that long and retry a few times.
+ */
+async function fetchWithRetry(url, options, maxRetries = 3) {
+    for (let attempt = 0; ; attempt++) {
+        const response = await fetch(url, options);
+        if (![429, 503].includes(response.status) || attempt >= maxRetries) {
+            return response;
+        }
+        const retryAfter = parseInt(response.headers.get('Retry-After'), 10) || 1;
+        console.warn(`[API] ${url} returned ${response.status}, retrying in ${retryAfter}s`);
+        await new Promise(resolve => setTimeout(resolve, retryAfter * 1000));
+    }
+}
+
 /**
  * Create a new game session
  * @param {number} numPlayers - Number of players (3-5)
@@ -24,7 +40,7 @@ function logAPI(method, endpoint, params, result) {
 export async function newGame(numPlayers, opponentType = 'PlanningPlayer') {
     const params = { num_players: numPlayers, opponent_type: opponentType };
 
-    const response = await fetch(`${API_BASE_URL}/new_game`, {
+    const response = await fetchWithRetry(`${API_BASE_URL}/new_game`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify(params)
@@ -73,7 +89,7 @@ export async function getState(sessionId) {
 export async function flipHand(sessionId, flip) {
     const params = { session_id: sessionId, flip };
 
-    const response = await fetch(`${API_BASE_URL}/flip_hand`, {
+    const response = await fetchWithRetry(`${API_BASE_URL}/flip_hand`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify(params)
@@ -99,7 +115,7 @@ export async function flipHand(sessionId, flip) {
 export async function advance(sessionId, move = null) {
     const params = { session_id: sessionId, move };
 
-    const response = await fetch(`${API_BASE_URL}/advance`, {
+    const response = await fetchWithRetry(`${API_BASE_URL}/advance`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify(params)